@@ -1,13 +1,34 @@
 
-from pydantic_ai import Agent
+from pydantic_ai import Agent, NativeOutput
 from pydantic_ai.models.openai import OpenAIModel
 from pydantic_ai.providers.openai import OpenAIProvider
 from pydantic_ai.settings import ModelSettings
 
 
-from models import SimpleReport, ExplicitIKCReport, ExplicitAKHReport
-from typing import Optional
+from models import (
+    SimpleReport, ExplicitIKCReport, ExplicitAKHReport, REPORT_ADAPTERS,
+    ReportHeader, IKCLabResult, BatchAKHReport, IKCFlat,
+    ElectrolyteAndWaterBalance, Kidney, AminoAcidBilirubinAndHemeMetabolism,
+    Proteins, Enzymes, Inflammation, HeartAndMuscle,
+    DiabetesAndEnergyMetabolism, LipidAndArteriosclerosis, IronMetabolism,
+    Vitamins, ThyroidFunction, SexualHormones,
+)
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional
+import asyncio
+import atexit
+import hashlib
+import json
+import logging
 import os
+import re
+import time
+
+import httpx
+
+logger = logging.getLogger(__name__)
 
 system_prompt = """
 You are a medical report parser. Your task is to extract structured data from medical reports written in Markdown format.
@@ -22,30 +43,259 @@ Please follow these instructions:
 Add all the test available.
 """
 
+# Delimiter between documents when several short reports share one LLM call.
+DOC_BOUNDARY = "\n===DOC_BOUNDARY===\n"
 
-def extract_structured(
-    text: str, 
-    model_name: str, 
-    base_url: str, 
-    schema: str = "IKC",
-    api_key: Optional[str] = None,
-    temperature: float = 0.1,
-    top_p: float = 1.0,
-    top_k: int = 0,
-    frequency_penalty: float = 0.0,
-    presence_penalty: float = 0.0,
-    repetition_penalty: float = 1.1,
-    min_p: float = 0.0,
-    top_a: float = 0.0,
-    max_tokens: int = 32000
-):
 
+@lru_cache(maxsize=32)
+def _system_prompt_for(output_type: type) -> str:
+    """Return the system prompt used for an output type.
+
+    Built once per type and byte-identical across calls, so providers with
+    automatic prefix caching (OpenAI, vLLM with --enable-prefix-caching) skip
+    the system prompt's prefill after the first request of a batch. With
+    PROMPT_CACHE_PAD=1 the output schema is appended, pushing the shared
+    prefix past OpenAI's 1024-token caching threshold; the extra tokens are
+    charged once and cached for the rest of the batch.
+    """
+    prompt = system_prompt
+    if output_type is BatchAKHReport:
+        prompt = (
+            f"{prompt}\nThe input contains several documents separated by the line "
+            f"{DOC_BOUNDARY.strip()}. Return one reports entry per delimited document, in order.\n"
+        )
+    if os.getenv("PROMPT_CACHE_PAD"):
+        schema_json = json.dumps(output_type.model_json_schema(), sort_keys=True)
+        return f"{prompt}\nThe output must follow this JSON schema:\n{schema_json}\n"
+    return prompt
+
+
+schemas = {
+    "IKC": ExplicitIKCReport,
+    "AKH": ExplicitAKHReport
+}
+
+# Section headings that anchor the lab-result part of each report type.
+# Everything far ahead of the first anchor (addresses, legal notices) and
+# behind the terminating footer is boilerplate the LLM does not need;
+# prefill cost scales linearly with input tokens.
+_SECTION_ANCHOR_RES = {
+    "IKC": re.compile(
+        r"(Elektrolyt|Niere|Aminosäure|Proteine|Enzyme|Entzündung|Herz und Muskel"
+        r"|Diabetes|Lipidstoffwechsel|Eisenstoffwechsel|Vitamine|Schilddrüse|Sexualhormone)",
+        re.I
+    ),
+    "AKH": re.compile(
+        r"(Hämatologische|Blutstatus|Blutbild|Hämostase|Gerinnung)",
+        re.I
+    ),
+}
+_FOOTER_RE = re.compile(r"(Ende des Befund|Befundende)", re.I)
+_TRIM_HEADER_CHARS = 1500
+_TRIM_MIN_CHARS = 200
+
+
+def _trim(text: str, schema: str) -> str:
+    """Drop boilerplate around the lab sections before sending text to the LLM.
+
+    Keeps the tail of the report header (patient ID, project, dates sit just
+    before the first section) and everything from the first known section
+    anchor to the terminating footer. Falls back to the full text when no
+    anchor is found or the result is suspiciously short.
+    """
+    anchor_re = _SECTION_ANCHOR_RES.get(schema)
+    if anchor_re is None:
+        return text
+    match = anchor_re.search(text)
+    if match is None:
+        return text
+    head = text[max(0, match.start() - _TRIM_HEADER_CHARS):match.start()]
+    body = text[match.start():]
+    footer = _FOOTER_RE.search(body)
+    if footer is not None:
+        body = body[:footer.end()]
+    trimmed = head + body
+    if len(trimmed) < _TRIM_MIN_CHARS:
+        return text
+    return trimmed
+
+
+def _make_http_client() -> httpx.AsyncClient:
+    """One pooled HTTP client shared by all LLM calls.
+
+    Avoids a fresh TCP/TLS handshake per file and multiplexes concurrent
+    requests over kept-alive connections (HTTP/2 when the h2 extra is
+    installed).
+    """
+    limits = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+    try:
+        return httpx.AsyncClient(http2=True, limits=limits, timeout=120)
+    except ImportError:
+        return httpx.AsyncClient(limits=limits, timeout=120)
+
+
+_http = _make_http_client()
+
+
+def _close_http_client() -> None:
+    try:
+        asyncio.run(_http.aclose())
+    except RuntimeError:
+        pass
+
+
+atexit.register(_close_http_client)
+
+# Response cache: identical (model, schema, text) inputs reuse the previous
+# LLM output instead of paying for a new call. Two tiers — a small in-memory
+# LRU in front of one JSON file per key on disk, expired by file age. The key
+# includes a hash of the schema's JSON representation, so editing a model in
+# models.py invalidates its cached responses automatically. Disable with
+# DIDC_PDF_PARSER_NO_CACHE=1.
+_CACHE_DIR = Path(os.getenv("DIDC_PDF_PARSER_CACHE", "~/.cache/didc-pdf-parser")).expanduser()
+_CACHE_TTL_SECONDS = 30 * 86400
+_L1_MAX_ENTRIES = 256
+_l1_cache: "OrderedDict[str, object]" = OrderedDict()
+
+
+def _cache_enabled() -> bool:
+    return not os.getenv("DIDC_PDF_PARSER_NO_CACHE")
+
+
+@lru_cache(maxsize=None)
+def _schema_fingerprint(schema: str) -> str:
+    """Short hash of the schema's JSON Schema, computed once per schema."""
+    dumped = json.dumps(schemas[schema].model_json_schema(), sort_keys=True)
+    return hashlib.blake2b(dumped.encode(), digest_size=8).hexdigest()
+
+
+def _cache_key(model_name: str, schema: str, text: str) -> str:
+    return hashlib.sha256(
+        f"{model_name}|{schema}:{_schema_fingerprint(schema)}|{text}".encode()
+    ).hexdigest()
+
+
+def _cache_get(key: str, schema: str):
+    """Return the cached structured output for key, or None on miss/expiry."""
+    cached = _l1_cache.get(key)
+    if cached is not None:
+        _l1_cache.move_to_end(key)
+        return cached
+    cache_path = _CACHE_DIR / f"{key}.json"
+    try:
+        if cache_path.stat().st_mtime < time.time() - _CACHE_TTL_SECONDS:
+            cache_path.unlink(missing_ok=True)
+            return None
+        output = REPORT_ADAPTERS[schemas[schema]].validate_json(cache_path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable cache entry {cache_path.name}: {e}")
+        return None
+    _l1_put(key, output)
+    return output
+
+
+def _l1_put(key: str, output) -> None:
+    _l1_cache[key] = output
+    _l1_cache.move_to_end(key)
+    while len(_l1_cache) > _L1_MAX_ENTRIES:
+        _l1_cache.popitem(last=False)
+
+
+def _cache_put(key: str, output) -> None:
+    _l1_put(key, output)
+    try:
+        _CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        (_CACHE_DIR / f"{key}.json").write_text(output.model_dump_json(), encoding="utf-8")
+    except OSError as e:
+        logger.warning(f"Could not write LLM response cache: {e}")
+
+
+class _SemanticCache:
+    """In-memory embedding-similarity cache for near-duplicate reports.
+
+    Longitudinal reports for the same patient share most of their text; the
+    exact-hash cache misses them but an embedding lookup can hit. Trades a
+    small correctness risk for skipped LLM calls, so it is opt-in only
+    (--semantic-cache). Requires sentence-transformers and faiss.
+    """
+
+    SIMILARITY_THRESHOLD = 0.98
+    EMBED_CHARS = 2048
+
+    def __init__(self):
+        from sentence_transformers import SentenceTransformer
+        import faiss
+
+        self._model = SentenceTransformer("all-MiniLM-L6-v2")
+        self._index = faiss.IndexFlatIP(self._model.get_sentence_embedding_dimension())
+        self._entries = []  # (schema, model_name, output) per index id
+
+    def _embed(self, text: str):
+        return self._model.encode([text[:self.EMBED_CHARS]], normalize_embeddings=True)
+
+    def get(self, text: str, schema: str, model_name: str):
+        if self._index.ntotal == 0:
+            return None
+        similarities, ids = self._index.search(self._embed(text), 1)
+        if similarities[0][0] < self.SIMILARITY_THRESHOLD:
+            return None
+        cached_schema, cached_model, output = self._entries[ids[0][0]]
+        # A near-duplicate produced by a different model or schema is not a
+        # hit: --model-name can change mid-process
+        if cached_schema != schema or cached_model != model_name:
+            return None
+        return output
+
+    def put(self, text: str, schema: str, model_name: str, output) -> None:
+        self._index.add(self._embed(text))
+        self._entries.append((schema, model_name, output))
+
+
+_semantic_cache: Optional[_SemanticCache] = None
+
+
+def enable_semantic_cache() -> bool:
+    """Turn on the semantic cache. Returns False if its optional deps are missing."""
+    global _semantic_cache
+    if _semantic_cache is not None:
+        return True
+    try:
+        _semantic_cache = _SemanticCache()
+        return True
+    except ImportError as e:
+        logger.error(f"Semantic cache requires sentence-transformers and faiss: {e}")
+        return False
+
+
+@lru_cache(maxsize=32)
+def _build_agent(
+    model_name: str,
+    base_url: str,
+    output_type: type,
+    api_key: Optional[str],
+    temperature: float,
+    top_p: float,
+    top_k: int,
+    frequency_penalty: float,
+    presence_penalty: float,
+    repetition_penalty: float,
+    min_p: float,
+    top_a: float,
+    max_tokens: int
+) -> Agent:
+    """Build a pydantic-ai agent configured for the requested schema.
+
+    Cached so batch runs reuse one agent (compiled output schema, HTTP client)
+    per configuration instead of rebuilding it for every PDF.
+    """
     model = OpenAIModel(
         model_name=model_name,
-        provider=OpenAIProvider(base_url=base_url, api_key=api_key),
+        provider=OpenAIProvider(base_url=base_url, api_key=api_key, http_client=_http),
     )
 
-    model_settings = ModelSettings(
+    settings_kwargs = dict(
         temperature=temperature,
         top_p=top_p,
         top_k=top_k,
@@ -57,14 +307,319 @@ def extract_structured(
         max_tokens=max_tokens
     )
 
-    schemas = {
-        "IKC": ExplicitIKCReport,
-        "AKH": ExplicitAKHReport
-    }
+    # With LLM_STRICT_JSON=1 the schema is enforced server-side via grammar-
+    # constrained decoding (the json_schema response format on OpenAI/vLLM/
+    # llama.cpp): fewer generated tokens and no need for the validation retry
+    # loop. NativeOutput is pydantic-ai's own response_format path — setting
+    # response_format through extra_body would fight the default tool-call
+    # output mode.
+    retries = 3
+    agent_output_type = output_type
+    if os.getenv("LLM_STRICT_JSON"):
+        agent_output_type = NativeOutput(output_type)
+        retries = 1
+
+    model_settings = ModelSettings(**settings_kwargs)
+
+    return Agent(model, output_type=agent_output_type, model_settings=model_settings, system_prompt=_system_prompt_for(output_type), retries=retries)
+
+
+# The IKC sections are disjoint, so they can be extracted by independent LLM
+# calls running in parallel (the server batches them); wall time then tracks
+# the slowest section instead of the sum of all of them.
+_IKC_SECTION_MODELS = {
+    "electrolyte_and_water_balance": ElectrolyteAndWaterBalance,
+    "kidney": Kidney,
+    "amino_acid_bilirubin_and_heme_metabolism": AminoAcidBilirubinAndHemeMetabolism,
+    "proteins": Proteins,
+    "enzymes": Enzymes,
+    "inflammation": Inflammation,
+    "heart_and_muscle": HeartAndMuscle,
+    "diabetes_and_energy_metabolism": DiabetesAndEnergyMetabolism,
+    "lipid_and_arteriosclerosis": LipidAndArteriosclerosis,
+    "iron_metabolism": IronMetabolism,
+    "vitamins": Vitamins,
+    "thyroid_function": ThyroidFunction,
+    "sexual_hormones": SexualHormones,
+}
+
+
+async def _extract_ikc_fanout(
+    text: str,
+    model_name: str,
+    base_url: str,
+    api_key: Optional[str],
+    temperature: float,
+    top_p: float,
+    top_k: int,
+    frequency_penalty: float,
+    presence_penalty: float,
+    repetition_penalty: float,
+    min_p: float,
+    top_a: float,
+    max_tokens: int
+) -> ExplicitIKCReport:
+    """Extract an IKC report as one header call plus one call per section."""
+
+    async def run_one(output_type: type):
+        agent = _build_agent(
+            model_name, base_url, output_type, api_key,
+            temperature, top_p, top_k, frequency_penalty, presence_penalty,
+            repetition_penalty, min_p, top_a, max_tokens
+        )
+        result = await agent.run(text)
+        return result.output
+
+    header, *sections = await asyncio.gather(
+        run_one(ReportHeader),
+        *[run_one(section_model) for section_model in _IKC_SECTION_MODELS.values()]
+    )
+
+    lab_result = IKCLabResult(**dict(zip(_IKC_SECTION_MODELS, sections)))
+    return ExplicitIKCReport(**header.model_dump(), lab_result=lab_result)
 
-    agent = Agent(model, output_type=schemas[schema], model_settings=model_settings, system_prompt=system_prompt, retries=3)
+
+@lru_cache(maxsize=8)
+def smoke_test(model_name: str, base_url: str, api_key: Optional[str], timeout: float = 5.0) -> bool:
+    """Fire a tiny completion at the endpoint to validate the configuration.
+
+    Catches unreachable endpoints, bad API keys and unknown model names
+    before any PDF is parsed; on a misconfigured 100-file batch that saves
+    100 wasted Docling runs. Cached per configuration within the process.
+    """
+    headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+    try:
+        response = httpx.post(
+            f"{base_url.rstrip('/')}/chat/completions",
+            json={
+                "model": model_name,
+                "messages": [{"role": "user", "content": "ping"}],
+                "max_tokens": 5,
+            },
+            headers=headers,
+            timeout=timeout,
+        )
+        response.raise_for_status()
+        return True
+    except httpx.HTTPStatusError as e:
+        logger.error(f"LLM endpoint rejected the smoke test: {e.response.status_code} {e.response.text[:200]}")
+        return False
+    except httpx.HTTPError as e:
+        logger.error(f"LLM endpoint unreachable: {e}")
+        return False
+
+
+def _output_type_for(schema: str) -> type:
+    """Agent output type for a schema name.
+
+    With IKC_FLAT_SCHEMA=1 the LLM fills the flat analyte map instead of the
+    nested report (fewer generated tokens, one validation level); the explicit
+    form is rebuilt locally afterwards.
+    """
+    if schema == "IKC" and os.getenv("IKC_FLAT_SCHEMA"):
+        return IKCFlat
+    return schemas[schema]
+
+
+def extract_structured(
+    text: str,
+    model_name: str,
+    base_url: str,
+    schema: str = "IKC",
+    api_key: Optional[str] = None,
+    temperature: float = 0.1,
+    top_p: float = 1.0,
+    top_k: int = 0,
+    frequency_penalty: float = 0.0,
+    presence_penalty: float = 0.0,
+    repetition_penalty: float = 1.1,
+    min_p: float = 0.0,
+    top_a: float = 0.0,
+    max_tokens: int = 32000
+):
+
+    if not os.getenv("DIDC_PDF_PARSER_NO_TRIM"):
+        text = _trim(text, schema)
+
+    if _cache_enabled():
+        key = _cache_key(model_name, schema, text)
+        cached = _cache_get(key, schema)
+        if cached is not None:
+            logger.debug("LLM response cache hit, skipping LLM call")
+            return cached
+
+    if _semantic_cache is not None:
+        cached = _semantic_cache.get(text, schema, model_name)
+        if cached is not None:
+            logger.debug("Semantic cache hit, skipping LLM call")
+            return cached
+
+    agent = _build_agent(
+        model_name, base_url, _output_type_for(schema), api_key,
+        temperature, top_p, top_k, frequency_penalty, presence_penalty,
+        repetition_penalty, min_p, top_a, max_tokens
+    )
 
     result = agent.run_sync(text)
 
     print(result.usage())
-    return result.output
\ No newline at end of file
+    output = result.output
+    if isinstance(output, IKCFlat):
+        output = output.to_explicit()
+    if _cache_enabled():
+        _cache_put(key, output)
+    if _semantic_cache is not None:
+        _semantic_cache.put(text, schema, model_name, output)
+    return output
+
+
+async def extract_structured_async(
+    text: str,
+    model_name: str,
+    base_url: str,
+    schema: str = "IKC",
+    api_key: Optional[str] = None,
+    temperature: float = 0.1,
+    top_p: float = 1.0,
+    top_k: int = 0,
+    frequency_penalty: float = 0.0,
+    presence_penalty: float = 0.0,
+    repetition_penalty: float = 1.1,
+    min_p: float = 0.0,
+    top_a: float = 0.0,
+    max_tokens: int = 32000
+):
+    """Async variant of extract_structured for concurrent batch processing."""
+    if not os.getenv("DIDC_PDF_PARSER_NO_TRIM"):
+        text = _trim(text, schema)
+
+    if _cache_enabled():
+        key = _cache_key(model_name, schema, text)
+        cached = _cache_get(key, schema)
+        if cached is not None:
+            logger.debug("LLM response cache hit, skipping LLM call")
+            return cached
+
+    if _semantic_cache is not None:
+        cached = _semantic_cache.get(text, schema, model_name)
+        if cached is not None:
+            logger.debug("Semantic cache hit, skipping LLM call")
+            return cached
+
+    if schema == "IKC" and os.getenv("IKC_SECTION_FANOUT"):
+        output = await _extract_ikc_fanout(
+            text, model_name, base_url, api_key,
+            temperature, top_p, top_k, frequency_penalty, presence_penalty,
+            repetition_penalty, min_p, top_a, max_tokens
+        )
+    else:
+        agent = _build_agent(
+            model_name, base_url, _output_type_for(schema), api_key,
+            temperature, top_p, top_k, frequency_penalty, presence_penalty,
+            repetition_penalty, min_p, top_a, max_tokens
+        )
+
+        # Stream instead of blocking on the full decode: the output is consumed
+        # as tokens arrive, so the event loop stays free to schedule the next
+        # file's request while this response is still being generated.
+        async with agent.run_stream(text) as stream:
+            output = await stream.get_output()
+            print(stream.usage())
+        if isinstance(output, IKCFlat):
+            output = output.to_explicit()
+
+    if _cache_enabled():
+        _cache_put(key, output)
+    if _semantic_cache is not None:
+        _semantic_cache.put(text, schema, model_name, output)
+    return output
+
+async def extract_structured_many_async(
+    texts: List[str],
+    model_name: str,
+    base_url: str,
+    schema: str = "IKC",
+    api_key: Optional[str] = None,
+    concurrency: int = 8,
+    **settings
+) -> list:
+    """Extract several documents concurrently with one call per document.
+
+    LLM inference is network-bound, so a modest gather (8-16 in flight)
+    scales throughput near-linearly; because every call reuses the same
+    cached agent, the identical system-prompt prefix also lets the provider
+    serve prompt-cache hits across the batch. settings are forwarded to
+    extract_structured_async.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _one(text: str):
+        async with semaphore:
+            return await extract_structured_async(
+                text, model_name, base_url, schema, api_key, **settings
+            )
+
+    return list(await asyncio.gather(*(_one(text) for text in texts)))
+
+
+async def extract_structured_batch_async(
+    texts: List[str],
+    model_name: str,
+    base_url: str,
+    api_key: Optional[str] = None,
+    temperature: float = 0.1,
+    top_p: float = 1.0,
+    top_k: int = 0,
+    frequency_penalty: float = 0.0,
+    presence_penalty: float = 0.0,
+    repetition_penalty: float = 1.1,
+    min_p: float = 0.0,
+    top_a: float = 0.0,
+    max_tokens: int = 32000
+) -> List[ExplicitAKHReport]:
+    """Extract several short AKH reports with a single LLM call.
+
+    The texts are joined with DOC_BOUNDARY and returned as one report per
+    document, amortizing system-prompt prefill and network overhead across
+    the group. Each document still goes through the response cache
+    individually: hits are served from it and only the misses are sent to
+    the LLM. Raises ValueError if the LLM returns the wrong report count.
+    """
+    if not os.getenv("DIDC_PDF_PARSER_NO_TRIM"):
+        texts = [_trim(text, "AKH") for text in texts]
+
+    results: List[Optional[ExplicitAKHReport]] = [None] * len(texts)
+    keys: List[Optional[str]] = [None] * len(texts)
+    misses = list(range(len(texts)))
+    if _cache_enabled():
+        misses = []
+        for i, text in enumerate(texts):
+            keys[i] = _cache_key(model_name, "AKH", text)
+            cached = _cache_get(keys[i], "AKH")
+            if cached is not None:
+                results[i] = cached
+            else:
+                misses.append(i)
+        if not misses:
+            logger.debug("LLM response cache hit for all %d batched documents", len(texts))
+            return results
+
+    agent = _build_agent(
+        model_name, base_url, BatchAKHReport, api_key,
+        temperature, top_p, top_k, frequency_penalty, presence_penalty,
+        repetition_penalty, min_p, top_a, max_tokens
+    )
+
+    result = await agent.run(DOC_BOUNDARY.join(texts[i] for i in misses))
+
+    print(result.usage())
+    reports = result.output.reports
+    if len(reports) != len(misses):
+        raise ValueError(
+            f"Batched extraction returned {len(reports)} reports for {len(misses)} documents"
+        )
+    for i, report in zip(misses, reports):
+        results[i] = report
+        if keys[i] is not None:
+            _cache_put(keys[i], report)
+    return results
@@ -1,3 +1,5 @@
+import asyncio
+import concurrent.futures
 import logging
 import os
 from pathlib import Path
@@ -6,10 +8,12 @@ from typing import Optional, List
 import typer
 from rich.console import Console
 from rich.logging import RichHandler
-from rich.progress import Progress, TaskID
 
-from parser import parse_document
-from llm import extract_structured
+from main_utils import detect_analysis_type, find_pdf_files, _write_if_changed
+
+# parser, llm and models are imported lazily inside the functions that need
+# them: they pull in docling and pydantic-ai (torch, httpx, openai SDK), which
+# would otherwise make even `--help` pay a multi-hundred-ms import cost.
 
 # Set up rich console
 console = Console()
@@ -30,34 +34,16 @@ app = typer.Typer(
     add_completion=False
 )
 
-def detect_analysis_type(filename: str) -> str:
-    """Detect analysis type from filename."""
-    filename_upper = filename.upper()
-    if "IKC_" in filename_upper:
-        return "IKC"
-    elif "AKH_" in filename_upper:
-        return "AKH"
-    else:
-        logger.warning(f"No analysis type detected in filename '{filename}', defaulting to IKC")
-        return "IKC"
-
-def find_pdf_files(path: Path) -> List[Path]:
-    """Find all PDF files in a directory or return single file."""
-    if path.is_file():
-        if path.suffix.lower() == '.pdf':
-            return [path]
-        else:
-            logger.error(f"❌ File '{path}' is not a PDF")
-            raise typer.Exit(1)
-    elif path.is_dir():
-        pdf_files = list(path.glob("*.pdf"))
-        if not pdf_files:
-            logger.error(f"❌ No PDF files found in directory '{path}'")
-            raise typer.Exit(1)
-        return sorted(pdf_files)
-    else:
-        logger.error(f"❌ Path '{path}' does not exist")
-        raise typer.Exit(1)
+def _parse_worker_init(num_threads: int) -> None:
+    """Cap intra-op threading in each parse worker.
+
+    torch/onnxruntime default to one thread per core; with N workers that
+    oversubscribes the machine N-fold and the workers fight each other.
+    Must run before the worker imports torch, hence env vars rather than
+    torch.set_num_threads.
+    """
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ.setdefault(var, str(num_threads))
 
 def process_single_pdf(
     pdf_path: Path,
@@ -69,6 +55,10 @@ def process_single_pdf(
     final_api_key: Optional[str]
 ) -> bool:
     """Process a single PDF file. Returns True if successful, False otherwise."""
+    from llm import extract_structured
+    from models import dump_report_json
+    from parser import parse_document
+
     try:
         # Get base filename without extension
         base_name = pdf_path.stem
@@ -87,7 +77,7 @@ def process_single_pdf(
         # Step 2: Save raw text if requested
         if save_txt:
             logger.debug(f"Saving raw text to: {txt_path.name}")
-            txt_path.write_text(raw_text, encoding='utf-8')
+            _write_if_changed(txt_path, raw_text.encode('utf-8'))
             logger.debug("Raw text saved successfully")
         
         # Step 3: Extract structured data
@@ -97,7 +87,7 @@ def process_single_pdf(
         
         # Step 4: Save JSON output
         logger.debug(f"Saving structured data to: {json_path.name}")
-        json_path.write_text(structured.model_dump_json(indent=2), encoding='utf-8')
+        _write_if_changed(json_path, dump_report_json(structured))
         logger.info(f"✅ [bold green]{pdf_path.name}[/bold green] processed successfully", extra={"markup": True})
         
         return True
@@ -106,6 +96,178 @@ def process_single_pdf(
         logger.error(f"❌ Failed to process [bold red]{pdf_path.name}[/bold red]: {e}", extra={"markup": True})
         return False
 
+async def process_single_pdf_async(
+    pdf_path: Path,
+    analysis_type: str,
+    output_dir: Path,
+    save_txt: bool,
+    final_model_name: str,
+    final_base_url: str,
+    final_api_key: Optional[str],
+    parse_pool: Optional[concurrent.futures.Executor] = None,
+    llm_semaphore: Optional[asyncio.Semaphore] = None
+) -> bool:
+    """Async counterpart of process_single_pdf. Returns True if successful, False otherwise."""
+    from llm import extract_structured_async
+    from models import dump_report_json
+    from parser import parse_document
+
+    try:
+        # Get base filename without extension
+        base_name = pdf_path.stem
+
+        # Define output paths
+        txt_path = output_dir / f"{base_name}.txt"
+        json_path = output_dir / f"{base_name}.json"
+
+        logger.info(f"📄 Processing: [bold]{pdf_path.name}[/bold] (Analysis: {analysis_type})", extra={"markup": True})
+
+        # Step 1: Parse PDF to raw text. Parsing is CPU-bound, so batch runs hand
+        # it to a process pool; this overlaps parsing with in-flight LLM calls.
+        logger.debug("Extracting text from PDF...")
+        if parse_pool is not None:
+            loop = asyncio.get_running_loop()
+            raw_text = await loop.run_in_executor(parse_pool, parse_document, str(pdf_path))
+        else:
+            raw_text = await asyncio.to_thread(parse_document, str(pdf_path))
+        logger.debug(f"Text extraction completed ({len(raw_text)} characters)")
+
+        # Step 2: Save raw text if requested
+        if save_txt:
+            logger.debug(f"Saving raw text to: {txt_path.name}")
+            await asyncio.to_thread(_write_if_changed, txt_path, raw_text.encode('utf-8'))
+            logger.debug("Raw text saved successfully")
+
+        # Step 3: Extract structured data (LLM concurrency bounded by the caller)
+        logger.debug("Extracting structured data with LLM...")
+        if llm_semaphore is not None:
+            async with llm_semaphore:
+                structured = await extract_structured_async(raw_text, final_model_name, final_base_url, analysis_type, final_api_key)
+        else:
+            structured = await extract_structured_async(raw_text, final_model_name, final_base_url, analysis_type, final_api_key)
+        logger.debug("Structured data extraction completed")
+
+        # Step 4: Save JSON output (off the event loop; slow filesystems
+        # otherwise stall in-flight LLM calls)
+        logger.debug(f"Saving structured data to: {json_path.name}")
+        await asyncio.to_thread(_write_if_changed, json_path, dump_report_json(structured))
+        logger.info(f"✅ [bold green]{pdf_path.name}[/bold green] processed successfully", extra={"markup": True})
+
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ Failed to process [bold red]{pdf_path.name}[/bold red]: {e}", extra={"markup": True})
+        return False
+
+async def _run_batch(
+    pdf_files: List[Path],
+    analysis_type: Optional[str],
+    output_dir: Path,
+    save_txt: bool,
+    final_model_name: str,
+    final_base_url: str,
+    final_api_key: Optional[str],
+    llm_batch_size: int = 1
+) -> List[bool]:
+    """Process multiple PDFs as a two-stage pipeline.
+
+    Stage 1 (CPU-bound parsing) runs in a process pool while stage 2 (network-bound
+    LLM extraction) runs concurrently on the event loop, so neither resource idles
+    waiting for the other. A semaphore bounds in-flight LLM calls; a second one
+    bounds how many parsed texts are held in memory ahead of the LLM stage.
+    """
+    from rich.progress import Progress
+
+    from llm import extract_structured_batch_async
+    from models import dump_report_json
+    from parser import parse_document
+
+    llm_semaphore = asyncio.Semaphore(int(os.getenv("LLM_CONCURRENCY", "16")))
+    pending_limit = 32
+    pending_semaphore = asyncio.Semaphore(pending_limit)
+    # The grouped-AKH path holds llm_batch_size parsed texts per group, so
+    # concurrent groups are capped to keep the same overall in-memory bound
+    group_semaphore = asyncio.Semaphore(max(1, pending_limit // max(1, llm_batch_size)))
+
+    # One parse worker per core (overridable via PARSE_WORKERS), never more
+    # than there are files to parse.
+    max_workers = min(int(os.getenv("PARSE_WORKERS", os.cpu_count() or 1)), len(pdf_files))
+    threads_per_worker = max(1, (os.cpu_count() or 1) // max_workers)
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_parse_worker_init,
+        initargs=(threads_per_worker,),
+    ) as parse_pool, Progress(console=console) as progress:
+        task = progress.add_task("[green]Processing PDFs...", total=len(pdf_files))
+
+        async def process_one(pdf_path: Path) -> bool:
+            detected_analysis_type = analysis_type or detect_analysis_type(pdf_path.name)
+            async with pending_semaphore:
+                success = await process_single_pdf_async(
+                    pdf_path, detected_analysis_type, output_dir, save_txt,
+                    final_model_name, final_base_url, final_api_key,
+                    parse_pool=parse_pool, llm_semaphore=llm_semaphore
+                )
+            progress.update(task, advance=1)
+            return success
+
+        async def process_akh_group(group: List[Path]) -> List[bool]:
+            """Extract a group of short AKH reports with a single LLM call."""
+            try:
+                # Bound concurrent groups so at most ~pending_limit parsed
+                # texts sit in memory ahead of the LLM stage, matching the
+                # per-file path's pending_semaphore guarantee
+                async with group_semaphore:
+                    loop = asyncio.get_running_loop()
+                    raw_texts = await asyncio.gather(
+                        *[loop.run_in_executor(parse_pool, parse_document, str(p)) for p in group]
+                    )
+                    if save_txt:
+                        for pdf_path, raw_text in zip(group, raw_texts):
+                            await asyncio.to_thread(
+                                _write_if_changed, output_dir / f"{pdf_path.stem}.txt", raw_text.encode('utf-8')
+                            )
+                    async with llm_semaphore:
+                        reports = await extract_structured_batch_async(
+                            list(raw_texts), final_model_name, final_base_url, final_api_key
+                        )
+                    for pdf_path, report in zip(group, reports):
+                        await asyncio.to_thread(
+                            _write_if_changed, output_dir / f"{pdf_path.stem}.json", dump_report_json(report)
+                        )
+                        logger.info(f"✅ [bold green]{pdf_path.name}[/bold green] processed successfully", extra={"markup": True})
+                    return [True] * len(group)
+            except Exception as e:
+                logger.error(f"❌ Failed to process AKH group {[p.name for p in group]}: {e}")
+                return [False] * len(group)
+            finally:
+                progress.update(task, advance=len(group))
+
+        if llm_batch_size > 1:
+            # Short AKH reports are grouped into one LLM call per batch; the
+            # remaining files go through the regular per-file pipeline.
+            akh_files = [
+                p for p in pdf_files
+                if (analysis_type or detect_analysis_type(p.name)) == "AKH"
+            ]
+            other_files = [p for p in pdf_files if p not in akh_files]
+            groups = [
+                akh_files[i:i + llm_batch_size]
+                for i in range(0, len(akh_files), llm_batch_size)
+            ]
+            grouped_results = await asyncio.gather(
+                *[process_akh_group(g) for g in groups],
+                *[process_one(p) for p in other_files]
+            )
+            return [
+                success
+                for result in grouped_results
+                for success in (result if isinstance(result, list) else [result])
+            ]
+
+        return await asyncio.gather(*[process_one(p) for p in pdf_files])
+
 @app.command()
 def parse(
     input_path: Path = typer.Argument(
@@ -148,6 +310,18 @@ def parse(
         None,
         "--api-key", "-k",
         help="API key for the LLM service. Falls back to API_KEY environment variable."
+    ),
+    llm_batch_size: int = typer.Option(
+        1,
+        "--llm-batch-size",
+        help="Number of short AKH reports to combine into a single LLM request. "
+             "1 disables batching."
+    ),
+    semantic_cache: bool = typer.Option(
+        False,
+        "--semantic-cache",
+        help="Reuse LLM outputs for near-duplicate reports via embedding similarity. "
+             "Requires sentence-transformers and faiss; trades accuracy risk for speed."
     )
 ):
     """
@@ -175,10 +349,22 @@ def parse(
         logger.error("❌ Base URL is required. Provide --base-url or set BASE_URL environment variable.")
         raise typer.Exit(1)
     
+    if semantic_cache:
+        from llm import enable_semantic_cache
+        if not enable_semantic_cache():
+            logger.error("❌ Semantic cache could not be enabled. Install sentence-transformers and faiss-cpu.")
+            raise typer.Exit(1)
+
     logger.debug(f"Using model: {final_model_name}")
     logger.debug(f"Using base URL: {final_base_url}")
     logger.debug(f"API key {'provided' if final_api_key else 'not provided'}")
-    
+
+    # Fail fast on a bad endpoint/key/model before any PDF is parsed
+    from llm import smoke_test
+    if not smoke_test(final_model_name, final_base_url, final_api_key):
+        logger.error("❌ LLM endpoint check failed. Verify --base-url, --model-name and --api-key.")
+        raise typer.Exit(1)
+
     # Find PDF files to process
     pdf_files = find_pdf_files(input_path)
     logger.info(f"Found {len(pdf_files)} PDF file(s) to process")
@@ -213,22 +399,14 @@ def parse(
         else:
             failed += 1
     else:
-        # Multiple files processing with progress bar
-        with Progress(console=console) as progress:
-            task = progress.add_task("[green]Processing PDFs...", total=len(pdf_files))
-            
-            for pdf_path in pdf_files:
-                detected_analysis_type = analysis_type or detect_analysis_type(pdf_path.name)
-                
-                if process_single_pdf(
-                    pdf_path, detected_analysis_type, output_dir, save_txt,
-                    final_model_name, final_base_url, final_api_key
-                ):
-                    successful += 1
-                else:
-                    failed += 1
-                
-                progress.update(task, advance=1)
+        # Multiple files processing: concurrent LLM calls with a progress bar
+        results = asyncio.run(_run_batch(
+            pdf_files, analysis_type, output_dir, save_txt,
+            final_model_name, final_base_url, final_api_key,
+            llm_batch_size=llm_batch_size
+        ))
+        successful = sum(1 for success in results if success)
+        failed = len(results) - successful
     
     # Summary
     console.print(f"\n[bold green]✨ Processing completed![/bold green]")
@@ -0,0 +1,53 @@
+import hashlib
+import logging
+import re
+from pathlib import Path
+from typing import List
+
+import typer
+
+logger = logging.getLogger("pdf_parser")
+
+# Analysis-type tags recognized in filenames. New report types only need to be
+# added to this alternation (and to the schemas in llm.py).
+_DETECT_RE = re.compile(r"(?i)(IKC|AKH)_")
+
+def detect_analysis_type(filename: str) -> str:
+    """Detect analysis type from filename."""
+    match = _DETECT_RE.search(filename)
+    if match:
+        return match.group(1).upper()
+    logger.warning(f"No analysis type detected in filename '{filename}', defaulting to IKC")
+    return "IKC"
+
+def find_pdf_files(path: Path) -> List[Path]:
+    """Find all PDF files in a directory or return single file."""
+    if path.is_file():
+        if path.suffix.lower() == '.pdf':
+            return [path]
+        else:
+            logger.error(f"❌ File '{path}' is not a PDF")
+            raise typer.Exit(1)
+    elif path.is_dir():
+        pdf_files = list(path.glob("*.pdf"))
+        if not pdf_files:
+            logger.error(f"❌ No PDF files found in directory '{path}'")
+            raise typer.Exit(1)
+        return sorted(pdf_files)
+    else:
+        logger.error(f"❌ Path '{path}' does not exist")
+        raise typer.Exit(1)
+
+def _write_if_changed(path: Path, payload: bytes) -> None:
+    """Write payload to path unless the file already holds identical bytes.
+
+    Re-runs over an already-processed directory then leave mtimes untouched
+    and avoid rewriting identical bytes on slow (network) filesystems.
+    """
+    try:
+        if path.exists() and hashlib.blake2b(path.read_bytes()).digest() == hashlib.blake2b(payload).digest():
+            logger.debug(f"Output unchanged, skipping write: {path.name}")
+            return
+    except OSError:
+        pass
+    path.write_bytes(payload)
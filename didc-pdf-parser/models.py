@@ -1,5 +1,35 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, TypeAdapter, field_validator
+from typing import Dict, List, Optional
+
+# Fast JSON encoders for the output path. The report models themselves must
+# stay pydantic BaseModels because pydantic-ai uses them as agent output_type,
+# so the fast encoders are applied only at the serialization boundary and
+# both stay optional.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec.json
+except ImportError:
+    msgspec = None
+
+
+def dump_report_json(report: BaseModel) -> bytes:
+    """Serialize a report model to indented JSON bytes.
+
+    Prefers orjson, then msgspec, then a pre-built TypeAdapter routed through
+    pydantic-core's Rust serializer.
+    """
+    if orjson is not None:
+        return orjson.dumps(report.model_dump(), option=orjson.OPT_INDENT_2)
+    if msgspec is not None:
+        return msgspec.json.format(msgspec.json.encode(report.model_dump()), indent=2)
+    adapter = REPORT_ADAPTERS.get(type(report))
+    if adapter is not None:
+        return adapter.dump_json(report, indent=2)
+    return report.model_dump_json(indent=2).encode("utf-8")
 
 
 class SectionData(BaseModel):
@@ -14,6 +44,17 @@ class Section(BaseModel):
     section_name: str
     data: List[SectionData]
 
+class ReportHeader(BaseModel):
+    """Report metadata shared by all report types."""
+    report_id: str
+    project: str
+    patient_id: str
+    gender: Optional[str] = None
+    birth_year: Optional[str] = None
+    daily_id: Optional[str]
+    date: Optional[str]
+    time: Optional[str]
+
 class SimpleReport(BaseModel):
     report_id: str
     project: str
@@ -151,6 +192,118 @@ class ExplicitIKCReport(BaseModel):
     time: Optional[str]
     lab_result: IKCLabResult
 
+#####################################################################
+# Flat IKC Report Schema
+#####################################################################
+
+# Section membership of each IKC analyte key. The grouping is fixed, so the
+# nested explicit report can be reconstructed from a flat analyte map plus
+# this table.
+IKC_GROUPING = {
+    "electrolyte_and_water_balance": (ElectrolyteAndWaterBalance, [
+        "sodium", "potassium", "total_calcium", "albumin_corrected_calcium", "phosphate",
+    ]),
+    "kidney": (Kidney, [
+        "urea", "creatinine", "egfr_crea_ckd_epi_2009", "uric_acid",
+    ]),
+    "amino_acid_bilirubin_and_heme_metabolism": (AminoAcidBilirubinAndHemeMetabolism, [
+        "bilirubin_total",
+    ]),
+    "proteins": (Proteins, [
+        "protein", "albumin",
+    ]),
+    "enzymes": (Enzymes, [
+        "ast_got", "ggt", "alkaline_phosphatase",
+    ]),
+    "inflammation": (Inflammation, [
+        "crp",
+    ]),
+    "heart_and_muscle": (HeartAndMuscle, [
+        "ck_total", "troponin_t_hs", "nt_pro_bnp",
+    ]),
+    "diabetes_and_energy_metabolism": (DiabetesAndEnergyMetabolism, [
+        "glucose_hep_plasma", "hba1c_ngsp", "hba1c_ifcc",
+    ]),
+    "lipid_and_arteriosclerosis": (LipidAndArteriosclerosis, [
+        "total_cholesterol", "hdl_cholesterol", "non_hdl_cholesterol",
+        "ldl_cholesterol_sampson", "triglycerides", "lipoprotein_a",
+        "apolipoprotein_a1", "apolipoprotein_b",
+    ]),
+    "iron_metabolism": (IronMetabolism, [
+        "iron", "ferritin_eclia", "ferritin_risk_eclia", "transferrin",
+    ]),
+    "vitamins": (Vitamins, [
+        "folic_acid", "vitamin_b12", "hydroxyvitamin_d",
+    ]),
+    "thyroid_function": (ThyroidFunction, [
+        "tsh_basal_ft4", "ft3_free", "ft4_free",
+    ]),
+    "sexual_hormones": (SexualHormones, [
+        "testosterone", "estradiol", "lh", "fsh", "progesterone",
+    ]),
+}
+
+# Analyte keys known to the flat schema, and the subset the section models
+# actually require. The two differ: SexualHormones declares the
+# female-specific hormones as Optional, so a valid report may omit them.
+IKC_ANALYTE_KEYS = frozenset(
+    key for _, analyte_keys in IKC_GROUPING.values() for key in analyte_keys
+)
+IKC_REQUIRED_ANALYTE_KEYS = frozenset(
+    key
+    for section_cls, analyte_keys in IKC_GROUPING.values()
+    for key in analyte_keys
+    if section_cls.model_fields[key].is_required()
+)
+
+class IKCFlat(BaseModel):
+    """IKC report as a single flat analyte map.
+
+    One validation level and no repeated section captions in the JSON the LLM
+    generates; the nested ExplicitIKCReport is rebuilt on demand via
+    to_explicit() using IKC_GROUPING.
+    """
+    report_id: str
+    project: str
+    patient_id: str
+    gender: Optional[str] = None
+    birth_year: Optional[str] = None
+    daily_id: Optional[str]
+    date: Optional[str]
+    time: Optional[str]
+    analytes: Dict[str, Analyte]
+
+    @field_validator("analytes")
+    @classmethod
+    def _complete_analytes(cls, analytes: Dict[str, Analyte]) -> Dict[str, Analyte]:
+        """Require the analyte keys the section models require.
+
+        Keys that are Optional in their section model may be absent.
+        Raising here makes an incomplete or misspelled analyte map a normal
+        validation error, which the agent's retry loop can correct — rather
+        than a crash in to_explicit() after extraction already "succeeded".
+        """
+        missing = IKC_REQUIRED_ANALYTE_KEYS - analytes.keys()
+        unknown = analytes.keys() - IKC_ANALYTE_KEYS
+        if missing or unknown:
+            raise ValueError(
+                f"analytes must contain all required analyte keys and no others; "
+                f"missing: {sorted(missing)}, unknown: {sorted(unknown)}"
+            )
+        return analytes
+
+    def to_explicit(self) -> "ExplicitIKCReport":
+        sections = {}
+        for section_name, (section_cls, analyte_keys) in IKC_GROUPING.items():
+            # .get() leaves absent optional analytes as None; required ones
+            # are guaranteed present by the validator
+            section_fields = {key: self.analytes.get(key) for key in analyte_keys}
+            sections[section_name] = section_cls(**section_fields)
+        return ExplicitIKCReport(
+            **self.model_dump(exclude={"analytes"}),
+            lab_result=IKCLabResult(**sections),
+        )
+
 #####################################################################
 # Explicit AKH Report Schema
 #####################################################################
@@ -212,6 +365,29 @@ class ExplicitAKHReport(BaseModel):
     gender: Optional[str] = None
     birth_year: Optional[str] = None
     daily_id: Optional[str]
-    date: Optional[str] 
+    date: Optional[str]
     time: Optional[str]
-    lab_result: AKHLabResult
\ No newline at end of file
+    lab_result: AKHLabResult
+
+class BatchAKHReport(BaseModel):
+    """Container for extracting several delimited AKH reports in one LLM call."""
+    reports: List[ExplicitAKHReport]
+
+#####################################################################
+# Serialization adapters
+#####################################################################
+
+# Compile the nested schemas at import time instead of lazily inside the
+# first Agent(...) call, moving the multi-hundred-ms cold-start cost out of
+# the first extraction.
+SimpleReport.model_rebuild()
+ExplicitIKCReport.model_rebuild()
+ExplicitAKHReport.model_rebuild()
+
+# Built once at import time so each serialized file pays only the Rust
+# encoding pass, not adapter construction.
+REPORT_ADAPTERS = {
+    SimpleReport: TypeAdapter(SimpleReport),
+    ExplicitIKCReport: TypeAdapter(ExplicitIKCReport),
+    ExplicitAKHReport: TypeAdapter(ExplicitAKHReport),
+}
\ No newline at end of file
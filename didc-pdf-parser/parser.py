@@ -6,89 +6,500 @@
 #     doc = DocumentConverter().convert(path)
 #     return doc.document.export_to_markdown()
 
+import gc
+import hashlib
+import json
 import logging
+import mmap
+import os
+import pickle
+import stat
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional, Dict, Any
 
-from docling.document_converter import DocumentConverter, PdfFormatOption
-from docling.datamodel.base_models import InputFormat
-from docling.datamodel.pipeline_options import PdfPipelineOptions
-from docling.backend.pypdfium2_backend import PyPdfiumDocumentBackend
+# docling is imported inside the functions that convert documents: importing
+# it pulls in torch, onnxruntime and the OCR stack (multi-second, several
+# hundred MB), which callers of validate_pdf_file or the pypdfium2 fast path
+# never need. sys.modules caching makes repeat imports free.
 
 logger = logging.getLogger(__name__)
 
+
+@lru_cache(maxsize=1)
+def _doc_item_types() -> "tuple[Optional[type], Optional[type]]":
+    """Concrete docling-core item classes for the statistics counters.
+
+    Identity checks on these avoid per-item string formatting; returns
+    (None, None) on older docling-core versions without them.
+    """
+    try:
+        from docling_core.types.doc import TableItem, PictureItem
+        return TableItem, PictureItem
+    except ImportError:
+        return None, None
+
+# On-disk cache of converted documents: re-parsing the same PDF with the same
+# pipeline options (common in dev and re-processing runs) becomes a file read
+# instead of a full Docling OCR/layout/tableformer pass. Shares the cache root
+# with the LLM response cache; disable with DIDC_PDF_PARSER_NO_CACHE=1.
+_CACHE_DIR = Path(os.getenv("DIDC_PDF_PARSER_CACHE", "~/.cache/didc-pdf-parser")).expanduser() / "parsed"
+_CACHE_MAX_BYTES = int(float(os.getenv("DIDC_PARSE_CACHE_MAX_GB", "2")) * 1024 ** 3)
+
+
+def _parse_cache_enabled() -> bool:
+    return not os.getenv("DIDC_PDF_PARSER_NO_CACHE")
+
+
+@dataclass(frozen=True)
+class PdfProbe:
+    """Outcome of the single-scan PDF validation.
+
+    Carries the content digest and file size alongside validity so callers
+    never have to stat or re-read the file.
+    """
+    valid: bool
+    digest: Optional[str] = None
+    size: int = 0
+
+
+def _probe_pdf(path: Path) -> PdfProbe:
+    """Validate the PDF header and trailer and fingerprint the contents.
+
+    The single open plus fstat replaces the separate exists/is_file/stat/
+    header-read syscalls — the dominant cost for small files on network
+    filesystems. The file is mmap'd read-only: header and %%EOF trailer
+    checks touch just the first and last pages via the kernel page cache
+    (rejecting truncated PDFs before any Docling import), and hashing the
+    mapping feeds the parse cache without a Python-level read loop.
+    """
+    path = Path(path)
+    if path.suffix.lower() != '.pdf':
+        logger.error("File is not a PDF: %s", path)
+        return PdfProbe(False)
+    digest = hashlib.blake2b(digest_size=16)
+    try:
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            if not stat.S_ISREG(st.st_mode) or st.st_size == 0:
+                logger.error("Not a regular non-empty file: %s", path)
+                return PdfProbe(False)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm[:5] != b'%PDF-':
+                    logger.error("Invalid or empty PDF header: %s", path)
+                    return PdfProbe(False)
+                if mm.rfind(b'%%EOF', max(0, st.st_size - 1024)) == -1:
+                    logger.error("Missing %%%%EOF trailer (truncated PDF?): %s", path)
+                    return PdfProbe(False)
+                digest.update(mm)
+    except (OSError, ValueError) as e:
+        logger.error("Error reading PDF file %s: %s", path, e)
+        return PdfProbe(False)
+    return PdfProbe(True, digest.hexdigest(), st.st_size)
+
+
+def _options_fingerprint(pdf_options: "PdfPipelineOptions") -> str:
+    """Short stable hash of the effective pipeline options."""
+    dumped = json.dumps(pdf_options.model_dump(), sort_keys=True, default=str)
+    return hashlib.sha1(dumped.encode()).hexdigest()[:8]
+
+
+def _cache_key(digest: str, pdf_options: "PdfPipelineOptions") -> str:
+    return f"{digest}_{_options_fingerprint(pdf_options)}"
+
+
+def _cache_read(cache_path: Path) -> Optional[bytes]:
+    try:
+        return cache_path.read_bytes()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.warning("Ignoring unreadable parse cache entry %s: %s", cache_path.name, e)
+        return None
+
+
+def _cache_write(cache_path: Path, payload: bytes) -> None:
+    """Atomically store a cache entry, then keep the cache under its size cap."""
+    try:
+        _CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+        tmp_path.write_bytes(payload)
+        os.replace(tmp_path, cache_path)
+        _sweep_cache()
+    except OSError as e:
+        logger.warning("Could not write parse cache: %s", e)
+
+
+def _sweep_cache() -> None:
+    """Evict least-recently-used entries once the cache exceeds its size cap."""
+    entries = []
+    total_size = 0
+    for entry in _CACHE_DIR.iterdir():
+        try:
+            st = entry.stat()
+        except OSError:
+            continue
+        entries.append((st.st_atime, st.st_size, entry))
+        total_size += st.st_size
+    if total_size <= _CACHE_MAX_BYTES:
+        return
+    for _, size, entry in sorted(entries):
+        try:
+            entry.unlink()
+        except OSError:
+            continue
+        total_size -= size
+        if total_size <= _CACHE_MAX_BYTES:
+            break
+
+# Chars per pt² above which a sampled page counts as text-native. A letter/A4
+# page is ~500k pt² and a dense born-digital page carries ~3-5k chars
+# (density ~0.006-0.01); scanned pages sit near zero.
+_FAST_PATH_MIN_DENSITY = 0.005
+
+
+def _text_native_text(path: Path) -> Optional[str]:
+    """Extract text directly with pypdfium2 when the PDF is text-native.
+
+    Samples the first, middle and last pages and measures character density;
+    for documents below the threshold (scanned or image-heavy) this returns
+    None and the caller falls through to the full Docling pipeline.
+    """
+    try:
+        import pypdfium2 as pdfium
+        pdf = pdfium.PdfDocument(path)
+        try:
+            n = len(pdf)
+            chars = 0
+            area = 0.0
+            for i in sorted({0, n // 2, n - 1}):
+                page = pdf[i]
+                chars += len(page.get_textpage().get_text_bounded() or "")
+                width, height = page.get_size()
+                area += width * height
+            if area <= 0 or chars / area < _FAST_PATH_MIN_DENSITY:
+                return None
+            pages = [pdf[i].get_textpage().get_text_bounded() or "" for i in range(n)]
+        finally:
+            pdf.close()
+        return "\n\n".join(pages)
+    except Exception as e:
+        logger.debug("Text-native probe failed for %s: %s", path, e)
+        return None
+
+
+def _resolve_ocr(path: Path, ocr_enabled: Optional[bool]) -> bool:
+    """Decide whether OCR is needed when the caller did not say.
+
+    Text-native PDFs (the common case for lab reports) carry their own text
+    layer, and running OCR over them is pure wasted compute. A pypdfium2
+    probe of the first page settles it; anything ambiguous keeps OCR on.
+    """
+    if ocr_enabled is not None:
+        return ocr_enabled
+    try:
+        import pypdfium2 as pdfium
+        pdf = pdfium.PdfDocument(path)
+        try:
+            text = pdf[0].get_textpage().get_text_bounded()
+        finally:
+            pdf.close()
+        if text and len(text) > 200:
+            logger.debug("Text layer found on page 1, leaving OCR off: %s", path)
+            return False
+    except Exception as e:
+        logger.debug("OCR probe failed for %s: %s", path, e)
+    return True
+
+
+def _table_mode(table_mode: str) -> "TableFormerMode":
+    from docling.datamodel.pipeline_options import TableFormerMode
+
+    # "accurate" is ~4x slower than "fast" for little gain on simple
+    # lab-report tables, so fast is the default.
+    return TableFormerMode.ACCURATE if table_mode == "accurate" else TableFormerMode.FAST
+
+
+@lru_cache(maxsize=1)
+def _threaded_pipeline_cls() -> Optional[type]:
+    """ThreadedStandardPdfPipeline when this docling version ships it.
+
+    The threaded pipeline overlaps layout, OCR and tableformer work on a
+    single document; older docling releases fall back to the sequential
+    standard pipeline.
+    """
+    try:
+        from docling.pipeline.threaded_standard_pdf_pipeline import ThreadedStandardPdfPipeline
+        return ThreadedStandardPdfPipeline
+    except ImportError:
+        return None
+
+
+@lru_cache(maxsize=1)
+def _default_pdf_options() -> "PdfPipelineOptions":
+    """Baseline pipeline options, validated once per process."""
+    from docling.datamodel.pipeline_options import PdfPipelineOptions
+
+    options = PdfPipelineOptions(
+        do_ocr=False,
+        do_table_structure=True,
+        generate_page_images=False,
+        generate_table_images=False,
+    )
+    options.table_structure_options.mode = _table_mode("fast")
+    return options
+
+
+def _pdf_options(
+    do_ocr: bool,
+    do_table_structure: bool,
+    generate_page_images: bool,
+    generate_table_images: bool,
+    table_mode: str = "fast"
+) -> "PdfPipelineOptions":
+    """Derive effective options from the validated baseline.
+
+    model_copy skips pydantic re-validation of unchanged fields, and the
+    common all-defaults case returns the shared baseline object untouched.
+    Note there is no picture-extraction switch here: the pinned docling has
+    no such pipeline option (figures are picked up by the layout stage
+    regardless), so figure_extraction is not forwarded.
+    """
+    base = _default_pdf_options()
+    fields = type(base).model_fields
+    update = {
+        key: value
+        for key, value in (
+            ("do_ocr", do_ocr),
+            ("do_table_structure", do_table_structure),
+            ("generate_page_images", generate_page_images),
+            ("generate_table_images", generate_table_images),
+        )
+        if key in fields and getattr(base, key) != value
+    }
+    accurate = table_mode == "accurate"
+    if not update and not accurate:
+        return base
+    # Deep copy only when the nested table options must diverge from the
+    # shared baseline
+    options = base.model_copy(update=update, deep=accurate)
+    if accurate:
+        options.table_structure_options.mode = _table_mode(table_mode)
+    return options
+
+
+_converter_lock = threading.Lock()
+
+
+@lru_cache(maxsize=8)
+def _get_converter(
+    do_ocr: bool,
+    do_table_structure: bool,
+    do_picture_extraction: bool,
+    generate_page_images: bool,
+    generate_table_images: bool,
+    table_mode: str = "fast",
+    pipeline: str = "threaded"
+) -> "DocumentConverter":
+    """Shared converter per option combination.
+
+    Constructing a DocumentConverter loads the layout/tableformer models
+    (hundreds of MB of torch/onnx weights); reusing one instance amortizes
+    that across every conversion in the process.
+    """
+    from docling.backend.pypdfium2_backend import PyPdfiumDocumentBackend
+    from docling.datamodel.base_models import InputFormat
+    from docling.document_converter import DocumentConverter, PdfFormatOption
+
+    try:
+        # Larger batches keep the pipeline stages fed on long documents
+        from docling.datamodel.settings import settings
+        settings.perf.page_batch_size = 8
+        settings.perf.elements_batch_size = 32
+    except Exception as e:
+        logger.debug("Could not tune docling perf settings: %s", e)
+
+    with _converter_lock:
+        pdf_options = _pdf_options(
+            do_ocr, do_table_structure,
+            generate_page_images, generate_table_images, table_mode
+        )
+        format_option_kwargs: Dict[str, Any] = {
+            "pipeline_options": pdf_options,
+            "backend": PyPdfiumDocumentBackend,
+        }
+        pipeline_cls = _threaded_pipeline_cls() if pipeline == "threaded" else None
+        if pipeline_cls is not None:
+            format_option_kwargs["pipeline_cls"] = pipeline_cls
+        return DocumentConverter(
+            format_options={
+                InputFormat.PDF: PdfFormatOption(**format_option_kwargs)
+            }
+        )
+
+
+def _prepare_cache(
+    path: Path,
+    pdf_options: "PdfPipelineOptions",
+    suffix: str,
+    probe: Optional[PdfProbe] = None,
+    use_cache: bool = True
+) -> "tuple[Optional[Path], Optional[bytes], Optional[PdfProbe]]":
+    """Resolve the parse-cache slot for one (file, options) pair.
+
+    Returns (cache_path, cached_payload, probe): cache_path is None when
+    caching is off, cached_payload is None on a miss. Validation rides along
+    with the probe, so an invalid PDF raises ValueError before any
+    conversion work.
+    """
+    if not (use_cache and _parse_cache_enabled()):
+        return None, None, probe
+    if probe is None:
+        probe = _probe_pdf(path)
+    if not probe.valid:
+        raise ValueError(f"Invalid PDF file: {path}")
+    cache_path = _CACHE_DIR / f"{_cache_key(probe.digest, pdf_options)}.{suffix}"
+    return cache_path, _cache_read(cache_path), probe
+
+
+def _convert(
+    path: Path,
+    ocr_enabled: bool,
+    table_structure_detection: bool,
+    figure_extraction: bool,
+    generate_page_images: bool,
+    generate_table_images: bool,
+    table_mode: str = "fast",
+    pipeline: str = "threaded",
+    custom_options: Optional[Dict[str, Any]] = None
+):
+    """Run one Docling conversion, sharing converters whenever options allow.
+
+    Both public parse functions funnel through here, so the converter cache,
+    the options baseline and any future pipeline tuning apply in one place.
+    """
+    if custom_options:
+        # Custom format options are not hashable; build a one-off converter
+        from docling.backend.pypdfium2_backend import PyPdfiumDocumentBackend
+        from docling.datamodel.base_models import InputFormat
+        from docling.document_converter import DocumentConverter, PdfFormatOption
+
+        format_options = {
+            InputFormat.PDF: PdfFormatOption(
+                pipeline_options=_pdf_options(
+                    ocr_enabled, table_structure_detection,
+                    generate_page_images, generate_table_images, table_mode
+                ),
+                backend=PyPdfiumDocumentBackend
+            )
+        }
+        format_options.update(custom_options)
+        converter = DocumentConverter(format_options=format_options)
+    else:
+        converter = _get_converter(
+            ocr_enabled, table_structure_detection, figure_extraction,
+            generate_page_images, generate_table_images, table_mode,
+            pipeline
+        )
+
+    logger.info("Starting document conversion...")
+    return converter.convert(path)
+
+
 def parse_document(
-    path: Path, 
-    ocr_enabled: bool = True,
+    path: Path,
+    ocr_enabled: Optional[bool] = None,
     table_structure_detection: bool = True,
     figure_extraction: bool = True,
+    generate_page_images: bool = False,
+    generate_table_images: bool = False,
+    table_mode: str = "fast",
+    pipeline: str = "threaded",
     custom_options: Optional[Dict[str, Any]] = None
 ) -> str:
     """
     Parse a PDF document with enhanced quality settings.
-    
+
     Args:
         path: Path to the PDF file
-        ocr_enabled: Enable OCR for scanned documents
+        ocr_enabled: Enable OCR for scanned documents; None (the default)
+            probes the first page and only enables OCR when no text layer
+            is found
         table_structure_detection: Enable table structure detection
         figure_extraction: Enable figure and image extraction
+        generate_page_images: Render per-page images (only needed by callers
+            that consume images; roughly halves throughput and doubles RSS)
+        generate_table_images: Render per-table images
+        table_mode: TableFormer mode, "fast" (default) or "accurate"
+        pipeline: "threaded" (default) overlaps layout/OCR/tableformer work
+            within a document when docling supports it; "standard" forces
+            the sequential pipeline
         custom_options: Additional custom options for the converter
-    
+
     Returns:
         Markdown representation of the document
     """
     try:
-        logger.info(f"Initializing document converter for: {path}")
-        
-        # Configure PDF processing options
-        pdf_options = PdfPipelineOptions(
-            # Enable OCR for better text extraction from scanned PDFs
-            do_ocr=ocr_enabled,
-            # Enable table structure detection
-            do_table_structure=table_structure_detection,
-            # Enable figure extraction
-            do_picture_extraction=figure_extraction,
-            # Improve text extraction quality
-            generate_page_images=True,
-            # Better handling of complex layouts
-            generate_table_images=True,
+        path = Path(path)
+
+        # Text-native shortcut: when the caller did not force OCR and the
+        # document carries a dense text layer, plain pypdfium2 extraction
+        # replaces the whole layout/OCR pipeline at a fraction of the cost.
+        if ocr_enabled is not True and not custom_options:
+            text = _text_native_text(path)
+            if text is not None:
+                logger.info("Text-native fast path used for: %s", path)
+                return f"## {path.stem}\n\n{text}"
+
+        logger.info("Initializing document converter for: %s", path)
+
+        ocr_enabled = _resolve_ocr(path, ocr_enabled)
+
+        # Configure PDF processing options (OCR only when the probe found no
+        # usable text layer; image rendering off by default since this
+        # function only returns markdown)
+        pdf_options = _pdf_options(
+            ocr_enabled, table_structure_detection,
+            generate_page_images, generate_table_images, table_mode
         )
-        
-        # Configure format-specific options
-        format_options = {
-            InputFormat.PDF: PdfFormatOption(
-                pipeline_options=pdf_options,
-                backend=PyPdfiumDocumentBackend
-            )
-        }
-        
-        # Apply custom options if provided
-        if custom_options:
-            format_options.update(custom_options)
-        
-        # Initialize converter with enhanced options
-        converter = DocumentConverter(
-            format_options=format_options
+
+        # Return the cached markdown when this exact PDF was already converted
+        # with the same pipeline options
+        cache_path, cached, _ = _prepare_cache(path, pdf_options, "md")
+        if cached is not None:
+            logger.info("Parse cache hit for: %s", path)
+            return cached.decode("utf-8")
+
+        result = _convert(
+            path, ocr_enabled, table_structure_detection, figure_extraction,
+            generate_page_images, generate_table_images, table_mode,
+            pipeline, custom_options
         )
-        
-        logger.info("Starting document conversion...")
-        
-        # Convert the document
-        result = converter.convert(path)
-        
+
+
         # Log conversion statistics
         if hasattr(result, 'pages'):
-            logger.info(f"Successfully processed {len(result.pages)} pages")
+            logger.info("Successfully processed %d pages", len(result.pages))
         
         # Export to markdown with enhanced formatting
         markdown_content = result.document.export_to_markdown()
-        
-        logger.info(f"Document conversion completed. Generated {len(markdown_content)} characters of markdown")
-        
+
+        # Only the markdown is needed past this point; the result holds page
+        # buffers and layout tensors that dominate RSS in batch runs
+        del result
+        gc.collect()
+
+        logger.info("Document conversion completed. Generated %d characters of markdown", len(markdown_content))
+
+        if cache_path is not None:
+            _cache_write(cache_path, markdown_content.encode("utf-8"))
+
         return markdown_content
         
     except Exception as e:
-        logger.error(f"Failed to parse document {path}: {str(e)}")
+        logger.error("Failed to parse document %s: %s", path, e)
         raise
 
 
@@ -96,75 +507,161 @@ def parse_document_with_metadata(
     path: Path,
     include_page_numbers: bool = True,
     preserve_formatting: bool = True,
+    include_images: bool = False,
+    markdown_path: Optional[Path] = None,
+    probe: Optional[PdfProbe] = None,
     **kwargs
 ) -> Dict[str, Any]:
     """
     Parse document and return both content and metadata.
-    
+
     Args:
         path: Path to the PDF file
         include_page_numbers: Include page number information
         preserve_formatting: Preserve original formatting as much as possible
+        include_images: Render page and table images (expensive; only enable
+            when a consumer actually needs them)
+        markdown_path: When given, write the markdown straight to this file
+            and return a 'markdown_path' entry instead of 'markdown_content',
+            keeping large documents out of RAM
+        probe: Pre-computed PdfProbe for this file, when the caller already
+            validated it; skips re-reading and re-statting the PDF
         **kwargs: Additional arguments for parse_document
-    
+
     Returns:
-        Dictionary containing markdown content, metadata, and statistics
+        Dictionary containing markdown content (or its path), metadata, and
+        statistics
     """
     try:
+        ocr_enabled = _resolve_ocr(Path(path), kwargs.get('ocr_enabled'))
+        table_mode = kwargs.get('table_mode', 'fast')
+
         # Configure enhanced options
-        pdf_options = PdfPipelineOptions(
-            do_ocr=kwargs.get('ocr_enabled', True),
-            do_table_structure=kwargs.get('table_structure_detection', True),
-            do_picture_extraction=kwargs.get('figure_extraction', True),
-            generate_page_images=True,
-            generate_table_images=True,
+        pdf_options = _pdf_options(
+            ocr_enabled,
+            kwargs.get('table_structure_detection', True),
+            include_images,
+            include_images,
+            table_mode,
         )
         
-        format_options = {
-            InputFormat.PDF: PdfFormatOption(
-                pipeline_options=pdf_options,
-                backend=PyPdfiumDocumentBackend
-            )
-        }
-        
-        converter = DocumentConverter(format_options=format_options)
-        result = converter.convert(path)
-        
+        # Cached variant of the full result dict (pickled, since it nests
+        # metadata values that are not JSON-native). Skipped when the caller
+        # streams markdown to a file: the cached dict would only hold a path
+        # that may not exist on a later run.
+        cache_path, cached, probe = _prepare_cache(
+            path, pdf_options, "pkl", probe, use_cache=markdown_path is None
+        )
+        if cached is not None:
+            logger.info("Parse cache hit for: %s", path)
+            document_data = pickle.loads(cached)
+            # Entries always carry page_info (see below); trim to the
+            # caller's request so the flag needn't be part of the cache key
+            if not include_page_numbers:
+                document_data.pop('page_info', None)
+            return document_data
+
+        result = _convert(
+            path,
+            ocr_enabled,
+            kwargs.get('table_structure_detection', True),
+            kwargs.get('figure_extraction', True),
+            include_images,
+            include_images,
+            table_mode,
+            kwargs.get('pipeline', 'threaded'),
+        )
+
+        # Probe the result shape once; the attribute cascades below all work
+        # off these locals instead of repeated result.document chains
+        doc = result.document
+        pages = getattr(result, 'pages', None)
+        texts = getattr(doc, 'texts', ())
+
+        # Export the markdown once and reuse it; each export_to_markdown call
+        # re-walks and re-serializes the whole document tree
+        markdown_content = doc.export_to_markdown()
+        character_count = len(markdown_content)
+
+        # Count tables and figures in a single pass over the texts
+        tables_detected = 0
+        figures_detected = 0
+        TableItem, PictureItem = _doc_item_types()
+        if TableItem is not None:
+            for item in texts:
+                item_type = type(item)
+                tables_detected += (item_type is TableItem)
+                figures_detected += (item_type is PictureItem)
+        else:
+            for item in texts:
+                type_name = type(item).__name__
+                tables_detected += (type_name == "TableItem")
+                figures_detected += (type_name == "PictureItem")
+
         # Extract comprehensive information
         document_data = {
-            'markdown_content': result.document.export_to_markdown(),
             'metadata': {
-                'title': getattr(result.document, 'title', None),
-                'author': getattr(result.document, 'author', None),
-                'creation_date': getattr(result.document, 'creation_date', None),
-                'modification_date': getattr(result.document, 'modification_date', None),
-                'page_count': len(result.pages) if hasattr(result, 'pages') else 0,
-                'file_size': path.stat().st_size if path.exists() else 0,
+                'title': getattr(doc, 'title', None),
+                'author': getattr(doc, 'author', None),
+                'creation_date': getattr(doc, 'creation_date', None),
+                'modification_date': getattr(doc, 'modification_date', None),
+                'page_count': len(pages) if pages is not None else 0,
+                'file_size': probe.size if probe is not None else (path.stat().st_size if path.exists() else 0),
                 'file_name': path.name,
             },
             'statistics': {
-                'character_count': len(result.document.export_to_markdown()),
-                'tables_detected': len([item for item in result.document.texts if 'table' in str(type(item)).lower()]) if hasattr(result.document, 'texts') else 0,
-                'figures_detected': len([item for item in result.document.texts if 'figure' in str(type(item)).lower()]) if hasattr(result.document, 'texts') else 0,
+                'character_count': character_count,
+                'tables_detected': tables_detected,
+                'figures_detected': figures_detected,
             }
         }
+
+        if markdown_path is not None:
+            # Write to disk and keep only the pointer; returning the content
+            # would hold it in RAM several more times (dict value, pickle
+            # buffer, the caller's serialization buffer)
+            markdown_path = Path(markdown_path)
+            markdown_path.write_text(markdown_content, encoding='utf-8')
+            document_data['markdown_path'] = str(markdown_path)
+            del markdown_content
+        else:
+            document_data['markdown_content'] = markdown_content
+
+
+        # Page-level information is always built so every cache entry is
+        # complete regardless of include_page_numbers; it is trimmed on
+        # return below. Pages are homogeneous, so one hasattr check on the
+        # first page specializes the comprehension instead of re-probing
+        # every page.
+        if pages is not None:
+            if pages and hasattr(pages[0], 'text'):
+                document_data['page_info'] = [
+                    {'page_number': n, 'content_length': len(page.text)}
+                    for n, page in enumerate(pages, 1)
+                ]
+            else:
+                document_data['page_info'] = [
+                    {'page_number': n, 'content_length': 0}
+                    for n in range(1, len(pages) + 1)
+                ]
         
-        # Add page-level information if requested
-        if include_page_numbers and hasattr(result, 'pages'):
-            document_data['page_info'] = [
-                {
-                    'page_number': i + 1,
-                    'content_length': len(page.text) if hasattr(page, 'text') else 0
-                }
-                for i, page in enumerate(result.pages)
-            ]
-        
-        logger.info(f"Enhanced parsing completed: {document_data['statistics']}")
-        
+        # Everything needed is in document_data now; free the conversion
+        # result before pickling so its page buffers don't inflate peak RSS
+        del result, doc, pages, texts
+        gc.collect()
+
+        logger.info("Enhanced parsing completed: %s", document_data['statistics'])
+
+        if cache_path is not None:
+            _cache_write(cache_path, pickle.dumps(document_data))
+
+        if not include_page_numbers:
+            document_data.pop('page_info', None)
+
         return document_data
-        
+
     except Exception as e:
-        logger.error(f"Failed to parse document with metadata {path}: {str(e)}")
+        logger.error("Failed to parse document with metadata %s: %s", path, e)
         raise
 
 
@@ -178,34 +675,7 @@ def validate_pdf_file(path: Path) -> bool:
     Returns:
         True if file is valid, False otherwise
     """
-    try:
-        if not path.exists():
-            logger.error(f"File does not exist: {path}")
-            return False
-        
-        if not path.is_file():
-            logger.error(f"Path is not a file: {path}")
-            return False
-        
-        if path.suffix.lower() != '.pdf':
-            logger.error(f"File is not a PDF: {path}")
-            return False
-        
-        # Check if file is not empty
-        if path.stat().st_size == 0:
-            logger.error(f"PDF file is empty: {path}")
-            return False
-        
-        # Try to read the first few bytes to check PDF header
-        with open(path, 'rb') as f:
-            header = f.read(5)
-            if not header.startswith(b'%PDF-'):
-                logger.error(f"Invalid PDF header: {path}")
-                return False
-        
-        logger.info(f"PDF file validation passed: {path}")
-        return True
-        
-    except Exception as e:
-        logger.error(f"Error validating PDF file {path}: {str(e)}")
-        return False
\ No newline at end of file
+    probe = _probe_pdf(path)
+    if probe.valid:
+        logger.info("PDF file validation passed: %s", path)
+    return probe.valid
\ No newline at end of file